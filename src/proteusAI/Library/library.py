@@ -5,10 +5,6 @@ __name__ = "proteusAI"
 __author__ = "Jonathan Funk"
 
 import os
-import sys
-current_path = os.path.dirname(os.path.abspath(__file__))
-root_path = os.path.join(current_path, '..')
-sys.path.append(root_path)
 from proteusAI.Protein.protein import Protein
 import proteusAI.ml_tools.esm_tools.esm_tools as esm_tools
 import proteusAI.ml_tools.torch_tools as torch_tools
@@ -91,6 +87,7 @@ class Library:
         self.struc_path = None
         self.class_dict = None
         self.pred_data = False
+        self._rep_stores = {}
 
         # Create user if user does not exist
         if not os.path.exists(self.user):
@@ -580,16 +577,18 @@ class Library:
         return blosum_representations
 
 
-    def load_representations(self, rep: Union[str, None], proteins: Union[list, None] = None):
+    def load_representations(self, rep: Union[str, None], proteins: Union[list, None] = None, save: bool = True):
         """
         Loads representations for a list of proteins.
 
         Args:
             rep (str): type of representation to load
             proteins (list): list of proteins to load, load all if None
+            save (bool): write changes of the representation store to disk. Pending changes are
+                written by the next call with save=True. Default True
 
         Returns:
-            list: List of representations.
+            torch.Tensor: Stacked representations, one flattened row per protein.
         """
 
         if self.rep_path == None:
@@ -598,14 +597,19 @@ class Library:
             rep_path = os.path.join(self.rep_path, rep)
 
         if proteins == None:
-            file_names = [protein.name + ".pt" for protein in self.proteins]
-        else:
-            file_names = [protein.name + ".pt" for protein in proteins]
+            proteins = self.proteins
 
         if rep in self.in_memory:
             reps = self.compute(method=rep, proteins=proteins)
-        else:
-            _, reps = io_tools.load_embeddings(path=rep_path, names=file_names)
+            return reps.reshape(len(reps), -1)
+
+        names = [protein.name for protein in proteins]
+
+        # the store stays in memory and only holds proteins of this library, proteins of other
+        # libraries (e.g. variants scored during a search) are read from their files
+        keep = {protein.name for protein in self.proteins}
+        reps, self._rep_stores[rep_path] = io_tools.load_embedding_store(path=rep_path, names=names, keep=keep, store=self._rep_stores.get(rep_path), save=save)
+
         return reps
     
     ### Folding ###
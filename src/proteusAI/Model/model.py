@@ -5,32 +5,35 @@ __name__ = "proteusAI"
 __author__ = "Jonathan Funk"
 
 import os
-import sys
-current_path = os.path.dirname(os.path.abspath(__file__))
-root_path = os.path.join(current_path, '..')
-sys.path.append(root_path)
 import torch
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.svm import SVC, SVR
 from sklearn.model_selection import KFold
+from sklearn.base import clone
 from sklearn.neighbors import KNeighborsClassifier, KNeighborsRegressor
 from sklearn.linear_model import Ridge, RidgeClassifier
 import proteusAI.io_tools as io_tools
 import proteusAI.visual_tools as vis
-from proteusAI.ml_tools.torch_tools import GP, predict_gp, computeR2
+from proteusAI.ml_tools.torch_tools import GP, predict_gp, trace_gp, computeR2
 import proteusAI.ml_tools.bo_tools as BO
 from proteusAI.Library import Library
 import random
+import warnings
 from typing import Union
 import json
-from joblib import dump
-import csv
+from joblib import dump, Parallel, delayed
 import torch
 import pandas as pd
 import gpytorch
 import numpy as np
 
 
+def _fit_fold(model, x, y, train_index, test_index):
+    """Fit a model on one cross validation fold and return it together with its test score."""
+    model.fit(x[train_index], y[train_index])
+    return model, model.score(x[test_index], y[test_index])
+
+
 class Model:
     """
     The Model object allows the user to create machine learning models, using 
@@ -49,6 +52,10 @@ class Model:
         optim (str): Optimizer for training PyTorch models. Default 'adam'.
         lr (float): Learning rate for training PyTorch models. Default 10e-4.
         seed (int): random seed. Default 21.
+        compile_model (bool): Compile trained models for faster prediction (hummingbird for sklearn, TorchScript for GPs with fast_pred_var). Default False.
+        half_precision (bool): Hold stored representations (e.g. esm2) as float16 while sklearn models predict, halving their memory. Ignored for encodings computed on the fly (ohe, blosum) and GPs. Default False.
+        fast_pred_var (bool): Approximate GP predictive variances with LOVE, faster for large training sets. Default False.
+        keops_threshold (int): Minimum number of training points to fit GPs with the KeOps kernel, requires pykeops and a compiler toolchain. Default None, which never uses KeOps.
         test_true (list): List of true values of the test dataset.
         test_predictions (list): Predicted values of the test dataset.
         test_r2 (float): R-squared value of the model on the test set.
@@ -78,8 +85,13 @@ class Model:
             optim (str): Optimizer for training PyTorch models. Default 'adam'.
             lr (float): Learning rate for training PyTorch models. Default 10e-4.
             seed (int): random seed. Default 21.
+            compile_model (bool): Compile trained models for faster prediction (hummingbird for sklearn, TorchScript for GPs with fast_pred_var). Default False.
+            half_precision (bool): Hold stored representations (e.g. esm2) as float16 while sklearn models predict, halving their memory. Ignored for encodings computed on the fly (ohe, blosum) and GPs. Default False.
+            fast_pred_var (bool): Approximate GP predictive variances with LOVE, faster for large training sets. Default False.
+            keops_threshold (int): Minimum number of training points to fit GPs with the KeOps kernel, requires pykeops and a compiler toolchain. Default None, which never uses KeOps.
         """
         self._model = None
+        self._compiled_model = None
         self.train_data = []
         self.test_data = []
         self.val_data = []
@@ -94,6 +106,7 @@ class Model:
         self.y_best = None
         self.out_df = None
         self.search_df = None
+        self._rep_cache = {}
 
         # check for device
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
@@ -118,7 +131,11 @@ class Model:
             'lr': 10e-4,
             'seed': None,
             'dest' : None,
-            'pbar' : None
+            'pbar' : None,
+            'compile_model' : False,
+            'half_precision' : False,
+            'fast_pred_var' : False,
+            'keops_threshold' : None
         }
         
         # Update defaults with provided keyword arguments
@@ -143,7 +160,11 @@ class Model:
             'lr': 10e-4,
             'seed': None,
             'dest' : None,
-            'pbar' : None
+            'pbar' : None,
+            'compile_model' : False,
+            'half_precision' : False,
+            'fast_pred_var' : False,
+            'keops_threshold' : None
         }
         
         # Update defaults with provided keyword arguments
@@ -172,6 +193,10 @@ class Model:
             optim (str): Choose optimizer for feed forward neural network. e.g. 'adam'.
             lr (float): Choose a learning rate for feed forward neural networks. e.g. 10e-4.
             seed (int): Choose a random seed. e.g. 42
+            compile_model (bool): Compile trained models for faster prediction (hummingbird for sklearn, TorchScript for GPs with fast_pred_var).
+            half_precision (bool): Hold stored representations (e.g. esm2) as float16 while sklearn models predict, halving their memory. Ignored for encodings computed on the fly (ohe, blosum) and GPs.
+            fast_pred_var (bool): Approximate GP predictive variances with LOVE, faster for large training sets.
+            keops_threshold (int): Minimum number of training points to fit GPs with the KeOps kernel, requires pykeops and a compiler toolchain.
             pbar: Progress bar for shiny app.
         """
         # Update attributes if new values are provided
@@ -179,9 +204,11 @@ class Model:
 
         # split data
         self.train_data, self.test_data, self.val_data = self.split_data()
+        self._rep_cache = {}
 
         # load model
         self._model = self.model()
+        self._compiled_model = None
 
         # train
         out = None
@@ -221,12 +248,15 @@ class Model:
             train_size = int(train_ratio * len(proteins))
             test_size = int(test_ratio * len(proteins))
 
-            random.shuffle(proteins)
+            # Shuffle indices instead of the protein list
+            rng = np.random.default_rng(self.seed)
+            idx = rng.permutation(len(proteins))
+            train_idx, test_idx, val_idx = np.split(idx, [train_size, train_size + test_size])
 
             # Split the data
-            train_data = proteins[:train_size]
-            test_data = proteins[train_size:train_size + test_size]
-            val_data = proteins[train_size + test_size:]
+            train_data = [proteins[i] for i in train_idx]
+            test_data = [proteins[i] for i in test_idx]
+            val_data = [proteins[i] for i in val_idx]
 
         # custom datasplit
         elif type(self.split) == dict:
@@ -241,7 +271,7 @@ class Model:
         return train_data, test_data, val_data
     
 
-    def load_representations(self, proteins: list, rep_path: Union[str, None] = None):
+    def load_representations(self, proteins: list, rep_path: Union[str, None] = None, save: bool = True):
         """
         Loads representations for a list of proteins.
 
@@ -249,19 +279,114 @@ class Model:
             proteins (list): List of proteins.
             rep_path (str): Path to representations. If None, the method assumes the
                 library project path and the representation type used for training.
+            save (bool): write changes of the library's representation store to disk. Default True
 
         Returns:
-            list: List of representations.
+            torch.Tensor: Stacked representations, one flattened row per protein.
         """
         if self.seed:
             torch.manual_seed(self.seed)
             torch.cuda.manual_seed_all(self.seed)
 
-        reps = self.library.load_representations(rep=self.x, proteins=proteins)
+        # reuse the representations of the training data if all proteins are known
+        index, cached = self._rep_cache.get(self.x, ({}, None))
+        if cached is not None and all(protein.name in index for protein in proteins):
+            idx = torch.tensor([index[protein.name] for protein in proteins], dtype=torch.long)
+            return cached[idx]
+
+        reps = self.library.load_representations(rep=self.x, proteins=proteins, save=save)
+        assert reps.dim() == 2, "Representations must be flattened, one row per protein"
 
         return reps
 
 
+    def _cache_representations(self, proteins: list, reps: torch.Tensor):
+        """
+        Keeps flattened representations of the training data in memory, so that
+        predict and score do not have to load them again.
+
+        Args:
+            proteins (list): List of proteins.
+            reps (torch.Tensor): Flattened representations, one row per protein.
+        """
+        index = {protein.name: i for i, protein in enumerate(proteins)}
+        self._rep_cache[self.x] = (index, reps.cpu())
+
+
+    def _stack_to_numpy(self, reps: torch.Tensor):
+        """
+        Converts flattened representations into a C-contiguous float32 array for sklearn models.
+        Representations that are already stored as float32 are not copied.
+
+        Args:
+            reps (torch.Tensor or np.ndarray): Flattened representations, one row per protein.
+
+        Returns:
+            np.ndarray: C-contiguous array of shape (number of proteins, representation size).
+        """
+        if isinstance(reps, torch.Tensor):
+            reps = reps.cpu().numpy()
+
+        return np.ascontiguousarray(reps, dtype=np.float32)
+
+
+    def _to_device(self, x: torch.Tensor):
+        """
+        Copies representations to the model device as float32. Copies to a GPU are staged
+        through pinned memory so they do not block the host.
+
+        Args:
+            x (torch.Tensor): Representations on the host.
+
+        Returns:
+            torch.Tensor: Representations on the model device.
+        """
+        if self.device.type == 'cuda':
+            return x.pin_memory().to(device=self.device, dtype=torch.float32, non_blocking=True)
+
+        return x.to(device=self.device, dtype=torch.float32)
+
+    def _predict_gp(self, x: torch.Tensor):
+        """
+        Predicts with the traced GP if there is one. If the traced GP fails it is dropped
+        with a warning, and this and all later predictions run in eager mode.
+
+        Args:
+            x (torch.Tensor): Representations on the model device.
+
+        Returns:
+            tuple: Predicted means and standard deviations.
+        """
+        if self._compiled_model is not None:
+            try:
+                return predict_gp(self._model, self.likelihood, x, traced=self._compiled_model)
+            except RuntimeError as e:
+                warnings.warn(f'The traced GP failed, predicting in eager mode: {e}')
+                self._compiled_model = None
+
+        return predict_gp(self._model, self.likelihood, x, fast=self.fast_pred_var)
+
+
+    def _compile_sklearn(self, x):
+        """
+        Compile the trained sklearn model, or every model of an ensemble, into tensor
+        operations with hummingbird. Compiled models predict large batches faster and
+        run on the GPU if one is available.
+
+        Args:
+            x (np.ndarray): Example input used to trace the models.
+        """
+        try:
+            from hummingbird.ml import convert
+        except ImportError:
+            raise ImportError('Compiling sklearn models requires hummingbird: Please install through pip:\npip install hummingbird-ml')
+
+        models = self._model if isinstance(self._model, list) else [self._model]
+        compiled = [convert(model, 'torch', x[:1]).to(self.device.type) for model in models]
+
+        self._compiled_model = compiled if isinstance(self._model, list) else compiled[0]
+
+
     def model(self, **kwargs):
         """
         Load or create model according to user specifications and parameters.
@@ -279,8 +404,8 @@ class Model:
             params_path = os.path.join(f"{self.library.rep_path}", f"../models/{self.model_type}/{self.x}/params.json")
             # Save destination for search_results
 
-        # Check if params.json exists
-        if not os.path.exists(params_path):
+        # Record custom parameters once, there is nothing to write for defaults
+        if kwargs and not os.path.exists(params_path):
             os.makedirs(os.path.dirname(params_path), exist_ok=True)
             with open(params_path, 'w') as f:
                 json.dump(kwargs, f)
@@ -288,6 +413,10 @@ class Model:
         if model_type in self._sklearn_models:
             model_params = kwargs.copy()
 
+            # forests and neighbour searches parallelize over all cores
+            if model_type in ('rf', 'knn'):
+                model_params.setdefault('n_jobs', -1)
+
             if self.y_type == 'class':
                 if model_type == 'rf':
                     model = RandomForestClassifier(**model_params)
@@ -336,19 +465,16 @@ class Model:
             pbar.set(message="Loading representations", detail=f"...")
 
         # This is for representations that are not stored in memory
-        train = self.load_representations(self.train_data, rep_path=rep_path)
-        test = self.load_representations(self.test_data, rep_path=rep_path)
+        # the representation store is written once, after all splits are loaded
+        train = self.load_representations(self.train_data, rep_path=rep_path, save=False)
+        test = self.load_representations(self.test_data, rep_path=rep_path, save=False)
         val = self.load_representations(self.val_data, rep_path=rep_path)
 
-        # handle representations that are not esm
-        if len(train[0].shape) == 2:
-            train = [x.view(-1) for x in train]
-            test = [x.view(-1) for x in test]
-            val = [x.view(-1) for x in val]
+        x_train = self._stack_to_numpy(train)
+        x_test = self._stack_to_numpy(test)
+        x_val = self._stack_to_numpy(val)
 
-        x_train = torch.stack(train).cpu().numpy()
-        x_test = torch.stack(test).cpu().numpy()
-        x_val = torch.stack(val).cpu().numpy()
+        self._cache_representations(self.train_data + self.test_data + self.val_data, torch.from_numpy(np.concatenate([x_train, x_test, x_val])))
 
         # TODO: For representations that are stored in memory the computation happens here:
         if self.library.pred_data:
@@ -369,6 +495,9 @@ class Model:
             # train model
             self._model.fit(x_train, self.y_train)
 
+            if self.compile_model:
+                self._compile_sklearn(x_train)
+
             # prediction on test set
             self.test_r2 = self._model.score(x_test, self.y_test)
             self.y_test_pred = self._model.predict(x_test)
@@ -418,7 +547,7 @@ class Model:
             # Concatenate the DataFrames
             self.out_df = pd.concat([train_df, test_df, val_df], axis=0).reset_index(drop=True)
 
-            self.y_best = max((max(self.y_train), max(self.y_test), max(self.y_val)))
+            self.y_best = np.concatenate([self.y_train, self.y_test, self.y_val]).max()
 
         # handle ensembles
         else:
@@ -428,29 +557,37 @@ class Model:
 
             kf = KFold(n_splits=self.k_folds, shuffle=True, random_state=self.seed)
             self.y_train = self.y_train + self.y_test
-            fold_results = []
-            ensemble = []
-
-            for i, data in enumerate(kf.split(x_train)):
-                train_index, test_index = data
-
-                if pbar:
-                    pbar.set(message=f"Training {self.model_type} {i+1}/{self.k_folds}", detail=f"...")
+            y_train = np.array(self.y_train)
 
-                x_train_fold, x_test_fold = x_train[train_index], x_train[test_index]
-                y_train_fold, y_test_fold = np.array(self.y_train)[train_index], np.array(self.y_train)[test_index]
-
-                self._model = self.model()
-                self._model.fit(x_train_fold, y_train_fold)
-                test_r2 = self._model.score(x_test_fold, y_test_fold)
-                fold_results.append(test_r2)
-                ensemble.append(self._model)
+            if pbar:
+                pbar.set(message=f"Training {self.k_folds} {self.model_type} models", detail=f"...")
+
+            # folds are independent, fit them in parallel on fresh copies of the model
+            fold_model = clone(self._model)
+            if 'n_jobs' in fold_model.get_params():
+                fold_model.set_params(n_jobs=1)  # avoid oversubscription, the folds already run in parallel
+
+            # the full training data is memory mapped once and shared by all workers
+            fits = Parallel(n_jobs=self.k_folds, max_nbytes='1M', mmap_mode='r')(
+                delayed(_fit_fold)(clone(fold_model), x_train, y_train, train_index, test_index)
+                for train_index, test_index in kf.split(x_train)
+            )
+            ensemble = [model for model, _ in fits]
+            fold_results = [test_r2 for _, test_r2 in fits]
+
+            # predictions of the fitted models use all cores again
+            if 'n_jobs' in fold_model.get_params():
+                for model in ensemble:
+                    model.set_params(n_jobs=self._model.get_params()['n_jobs'])
 
             avg_test_r2 = np.mean(fold_results)
 
             # Store model ensemble as model
             self._model = ensemble
 
+            if self.compile_model:
+                self._compile_sklearn(x_train)
+
             # Prediction on validation set
             self.val_data, self.y_val_pred, self.y_val_sigma, self.y_val, _ = self.predict(self.val_data)
             self.train_data, self.y_train_pred, self.y_train_sigma, self.y_train, _ = self.predict(self.train_data)
@@ -491,7 +628,7 @@ class Model:
             # Concatenate the DataFrames
             self.out_df = pd.concat([train_df, val_df], axis=0).reset_index(drop=True)
 
-            self.y_best = max((max(self.y_train), max(self.y_val)))
+            self.y_best = np.concatenate([self.y_train, self.y_val]).max()
 
         # Add predictions to proteins 
         for i in range(len(train)):
@@ -529,51 +666,47 @@ class Model:
             pbar.set(message=f"Loading representations", detail=f"...")
 
         # This is for representations that are not stored in memory
-        train = self.load_representations(self.train_data, rep_path=rep_path)
-        test = self.load_representations(self.test_data, rep_path=rep_path)
+        # the representation store is written once, after all splits are loaded
+        train = self.load_representations(self.train_data, rep_path=rep_path, save=False)
+        test = self.load_representations(self.test_data, rep_path=rep_path, save=False)
         val = self.load_representations(self.val_data, rep_path=rep_path)
 
-        # handle representations that are not esm
-        if len(train[0].shape) == 2:
-            train = [x.view(-1) for x in train]
-            test = [x.view(-1) for x in test]
-            val = [x.view(-1) for x in val]
+        x_train = self._to_device(train)
+        x_test = self._to_device(test)
+        x_val = self._to_device(val)
 
-        x_train = torch.stack(train).to(device=self.device)
-        x_test = torch.stack(test).to(device=self.device)
-        x_val = torch.stack(val).to(device=self.device)
+        self._cache_representations(self.train_data + self.test_data + self.val_data, torch.cat([train, test, val]))
 
         if self.library.pred_data:
-            self.y_train = torch.stack([torch.Tensor([protein.y_pred]) for protein in self.train_data]).view(-1).to(device=self.device)
-            self.y_test = torch.stack([torch.Tensor([protein.y_pred]) for protein in self.test_data]).view(-1).to(device=self.device)
-            y_val = torch.stack([torch.Tensor([protein.y_pred])  for protein in self.val_data]).view(-1).to(device=self.device)       
+            self.y_train = torch.as_tensor([protein.y_pred for protein in self.train_data], dtype=torch.float32, device=self.device)
+            self.y_test = torch.as_tensor([protein.y_pred for protein in self.test_data], dtype=torch.float32, device=self.device)
+            y_val = torch.as_tensor([protein.y_pred for protein in self.val_data], dtype=torch.float32, device=self.device)
         else:
-            self.y_train = torch.stack([torch.Tensor([protein.y]) for protein in self.train_data]).view(-1).to(device=self.device)
-            self.y_test = torch.stack([torch.Tensor([protein.y]) for protein in self.test_data]).view(-1).to(device=self.device)
-            y_val = torch.stack([torch.Tensor([protein.y])  for protein in self.val_data]).view(-1).to(device=self.device)
+            self.y_train = torch.as_tensor([protein.y for protein in self.train_data], dtype=torch.float32, device=self.device)
+            self.y_test = torch.as_tensor([protein.y for protein in self.test_data], dtype=torch.float32, device=self.device)
+            y_val = torch.as_tensor([protein.y for protein in self.val_data], dtype=torch.float32, device=self.device)
 
         self.val_names = [protein.name for protein in self.val_data]
 
         self.likelihood = gpytorch.likelihoods.GaussianLikelihood().to(device=self.device)
-        self._model = GP(x_train, self.y_train, self.likelihood).to(device=self.device)
+        self._model = GP(x_train, self.y_train, self.likelihood, keops_threshold=self.keops_threshold).to(device=self.device)
         fix_mean = True
         
         optimizer = torch.optim.Adam(self._model.parameters(), lr=initial_lr)
         scheduler = torch.optim.lr_scheduler.ExponentialLR(optimizer, gamma=decay_rate)
         mll = gpytorch.mlls.ExactMarginalLogLikelihood(self.likelihood, self._model)
 
-        #for param in self._model.named_parameters(): 
-        #    print(param)
-
         # model.mean_module.constant.data.fill_(1)  # FIX mean to 1
         self._model.train()
         self.likelihood.train()
-        prev_loss = float('inf')
+
+        # losses of the last 10 epochs stay on the device, the first entry holds the loss before the window
+        loss_buffer = torch.full((11,), float('inf'), device=self.device)
         
         if pbar:
             pbar.set(message=f"Training {self.model_type}", detail=f"...")
         
-        for _ in range(epochs):
+        for epoch in range(epochs):
             optimizer.zero_grad()
             output = self._model(x_train)
             loss = -mll(output, self.y_train)
@@ -581,26 +714,40 @@ class Model:
             optimizer.step()
             scheduler.step()
 
-            # Check for convergence
-            if abs(prev_loss - loss.item()) < 0.0001:
-            #    print(f'Convergence reached. Stopping training...')
-                break
-            
-            prev_loss = loss.item()
+            loss_buffer[epoch % 10 + 1] = loss.detach()
+
+            # Check for convergence every 10 epochs to avoid syncing with the device. The check uses
+            # the per-epoch loss differences, but training can continue for up to 9 epochs after the
+            # first epoch below the tolerance, so results differ slightly from checking every epoch.
+            if (epoch + 1) % 10 == 0:
+                if ((loss_buffer[1:] - loss_buffer[:-1]).abs() < 0.0001).any().item():
+                #    print(f'Convergence reached. Stopping training...')
+                    break
+                
+                loss_buffer[0] = loss_buffer[-1]
 
         print(f'Training completed. Final loss: {loss.item()}')   
+
+        self._compiled_model = None  # predict in eager mode
+        if self.compile_model and not self.fast_pred_var:
+            warnings.warn('Only GPs with fast_pred_var=True can be compiled, predicting in eager mode.')
+        elif self.compile_model:
+            try:
+                self._compiled_model = trace_gp(self._model, self.likelihood, x_train)  # None if not traced
+            except Exception as e:
+                warnings.warn(f'Tracing the GP failed, predicting in eager mode: {e}')
         
         # prediction on train set
-        y_train_pred, y_train_sigma = predict_gp(self._model, self.likelihood, x_train)
+        y_train_pred, y_train_sigma = self._predict_gp(x_train)
         self.y_train_pred, self.y_train_sigma  = y_train_pred.cpu().numpy(), y_train_sigma.cpu().numpy()
         
         # prediction on test set
-        y_test_pred, y_test_sigma = predict_gp(self._model, self.likelihood, x_test)
+        y_test_pred, y_test_sigma = self._predict_gp(x_test)
         self.test_r2 = computeR2(self.y_test, y_test_pred)
         self.y_test_pred, self.y_test_sigma  = y_test_pred.cpu().numpy(), y_test_sigma.cpu().numpy()
 
         # prediction on validation set
-        y_val_pred, y_val_sigma = predict_gp(self._model, self.likelihood, x_val)
+        y_val_pred, y_val_sigma = self._predict_gp(x_val)
         self.val_r2 = computeR2(y_val, y_val_pred)
         self.y_train = self.y_train.cpu().numpy()
         self.y_test_pred, self.y_test_sigma = y_test_pred.cpu().numpy(), y_test_sigma.cpu().numpy()
@@ -609,7 +756,7 @@ class Model:
         self.y_val = y_val.cpu().numpy()
         self.y_test = self.y_test.cpu().numpy()
 
-        self.y_best = max((max(self.y_train), max(self.y_test), max(self.y_val)))
+        self.y_best = np.concatenate([self.y_train, self.y_test, self.y_val]).max()
 
         # Add predictions to proteins 
         for i in range(len(train)):
@@ -671,32 +818,21 @@ class Model:
 
     # Save the sequences, y-values, and predicted y-values to CSV
     def save_to_csv(self, proteins, y_values, y_pred_values, y_sigma_values, filename, acq_scores=None):
-        # Prepare data for CSV and DataFrame
-        data = []
-        names = [prot.name for prot in proteins]
-        
+        df = pd.DataFrame({
+            'name': [prot.name for prot in proteins],
+            'sequence': [prot.seq for prot in proteins],
+            'y_true': list(y_values),
+            'y_predicted': list(y_pred_values),
+            'y_sigma': list(y_sigma_values)
+        })
+
         # Determine if acquisition scores are provided
         if acq_scores is not None:
-            header = ['name', 'sequence', 'y_value', 'y_predicted', 'y_sigma', 'acq_score']  # CSV header with acq_scores
-        else:
-            header = ['name', 'sequence', 'y_value', 'y_predicted', 'y_sigma']  # CSV header without acq_scores
-
-        with open(filename, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(header)
-            for i, (name, protein, y, y_pred, y_sigma) in enumerate(zip(names, proteins, y_values, y_pred_values, y_sigma_values)):
-                if acq_scores is not None:
-                    row = [name, protein.seq, y, y_pred, y_sigma, acq_scores[i]]
-                else:
-                    row = [name, protein.seq, y, y_pred, y_sigma]
-                writer.writerow(row)
-                data.append(row)
-        
-        # Create a DataFrame from the collected data
-        if acq_scores is not None:
-            df = pd.DataFrame(data, columns=['name', 'sequence', 'y_true', 'y_predicted', 'y_sigma', 'acq_score'])
-        else:
-            df = pd.DataFrame(data, columns=['name', 'sequence', 'y_true', 'y_predicted', 'y_sigma'])
+            df['acq_score'] = list(acq_scores)
+
+        # The CSV file names the true values 'y_value'
+        header = ['y_value' if col == 'y_true' else col for col in df.columns]
+        df.to_csv(filename, index=False, header=header)
         
         return df
     
@@ -726,53 +862,70 @@ class Model:
         elif acq_fn == 'random':
             acq = BO.random_acquisition
 
-        all_y_pred = []
-        all_sigma_pred = []
-        all_acq_scores = []
+        # use the compiled sklearn models if available
+        models = self._model if self._compiled_model is None else self._compiled_model
+
+        all_y_pred = np.empty(len(proteins))
+        all_sigma_pred = np.empty(len(proteins))
+        all_acq_scores = np.empty(len(proteins))
+
+        # Stored representations are already held in memory by the library, so they are
+        # stacked once and sliced per batch. Encodings computed on the fly stay batched.
+        preload = self.x not in self._in_memory_representations
+        if self.half_precision and not (preload and self.model_type != 'gp'):
+            warnings.warn(f"half_precision only applies to stored representations of sklearn models, ignored for '{self.x}' {self.model_type} models.")
+
+        if preload and self.model_type != 'gp' and self.half_precision:
+            # converted one batch at a time, so the full float32 stack never exists. Batches
+            # are promoted back to float32 when they are passed to the model
+            all_reps = None
+            for i in range(0, len(proteins), batch_size):
+                batch_reps = self.load_representations(proteins[i:i + batch_size], rep_path)
+                if all_reps is None:
+                    all_reps = np.empty((len(proteins), batch_reps.shape[1]), dtype=np.float16)
+                all_reps[i:i + batch_size] = batch_reps.cpu().numpy()
+        elif preload:
+            all_reps = self.load_representations(proteins, rep_path)
+            if self.model_type != 'gp':
+                all_reps = self._stack_to_numpy(all_reps)
 
         for i in range(0, len(proteins), batch_size):
-            batch_proteins = proteins[i:i + batch_size]
-            batch_reps = self.load_representations(batch_proteins, rep_path)
-
-            if len(batch_reps[0].shape) == 2:
-                batch_reps = [x.view(-1) for x in batch_reps]
+            if preload:
+                batch_reps = all_reps[i:i + batch_size]
+            else:
+                batch_proteins = proteins[i:i + batch_size]
+                batch_reps = self.load_representations(batch_proteins, rep_path)
 
             # GP
             if self.model_type == 'gp':
                 self.likelihood.eval()
-                x = torch.stack(batch_reps).to(device=self.device)
-                y_pred, sigma_pred = predict_gp(self._model, self.likelihood, x)
+                x = self._to_device(batch_reps)
+                y_pred, sigma_pred = self._predict_gp(x)
                 y_pred = y_pred.cpu().numpy()
                 sigma_pred = sigma_pred.cpu().numpy()
                 acq_score = acq(y_pred, sigma_pred, self.y_best)
 
             # Handle ensembles
             elif isinstance(self._model, list):
-                ys = []
-                for model in self._model:
-                    x = torch.stack(batch_reps).cpu().numpy()
-                    y_pred = model.predict(x)
-                    ys.append(y_pred)
+                x = self._stack_to_numpy(batch_reps)
+                y_stack = np.empty((len(models), len(x)))
+                for j, model in enumerate(models):
+                    y_stack[j] = model.predict(x)
         
-                y_stack = np.stack(ys)
-                y_pred = np.mean(y_stack, axis=0)
-                sigma_pred = np.std(y_stack, axis=0)
+                y_pred = y_stack.mean(axis=0)
+                sigma_pred = y_stack.std(axis=0)
                 acq_score = acq(y_pred, sigma_pred, self.y_best)
             
             # Handle single model
             else:
-                x = torch.stack(batch_reps).cpu().numpy()
-                y_pred = self._model.predict(x)
+                x = self._stack_to_numpy(batch_reps)
+                y_pred = models.predict(x)
                 sigma_pred = np.zeros_like(y_pred)
                 acq_score = acq(y_pred, sigma_pred, self.y_best)
 
-            all_y_pred.extend(y_pred)
-            all_sigma_pred.extend(sigma_pred)
-            all_acq_scores.extend(acq_score)
-
-        all_y_pred = np.array(all_y_pred)
-        all_sigma_pred = np.array(all_sigma_pred)
-        all_acq_scores = np.array(all_acq_scores)
+            all_y_pred[i:i + batch_size] = y_pred
+            all_sigma_pred[i:i + batch_size] = sigma_pred
+            all_acq_scores[i:i + batch_size] = acq_score
 
         # Sort acquisition scores and get sorted indices
         sorted_indices = np.argsort(all_acq_scores)[::-1]
@@ -810,10 +963,7 @@ class Model:
         
         reps = self.load_representations(proteins, rep_path)
 
-        if len(reps[0].shape) == 2:
-            reps = [x.view(-1) for x in reps]
-
-        x = torch.stack(reps).cpu().numpy()
+        x = self._stack_to_numpy(reps)
         y = [protein.y for protein in proteins]
 
         # ensemble
@@ -8,10 +8,6 @@ from typing import Union
 import inspect
 import os
 import warnings
-import sys
-current_path = os.path.dirname(os.path.abspath(__file__))
-root_path = os.path.join(current_path, '..')
-sys.path.append(root_path)
 from proteusAI.ml_tools.esm_tools import *
 from proteusAI.struc import *
 import hashlib
@@ -1,11 +1,11 @@
 # This source code is part of the proteusAI package and is distributed
 # under the MIT License.
 
-__name__ = "proteusAI"
+# __name__ is not overridden here, constraints are pickled by their module path
+# when ProteinDesign evaluates them in worker processes
 __author__ = "Jonathan Funk"
 
 import numpy as np
-import esm
 import typing as T
 import biotite.sequence as seq
 import biotite.sequence.align as align
@@ -13,6 +13,47 @@ from biotite.structure.io.pdb import PDBFile
 import biotite.structure as struc
 from biotite.structure import sasa
 import tempfile
+from proteusAI.ml_tools.esm_tools import get_esmfold
+
+# maps the canonical amino acids to their index in the biotite ProteinSequence alphabet
+AA_TO_IDX = bytes.maketrans(b'ACDEFGHIKLMNPQRSTVWY', bytes(range(20)))
+
+
+def encode_sequence(s: str):
+    """
+    Encodes a sequence of canonical amino acids as alphabet indices, using
+    a single translate pass instead of iterating over the characters.
+
+    Parameters:
+        s (str): amino acid sequence
+
+    Returns:
+        np.array: uint8 indices, None if the sequence contains other characters
+    """
+    # bytearray keeps the buffer writable, which the biotite aligner requires
+    codes = np.frombuffer(bytearray(s, 'ascii').translate(AA_TO_IDX), dtype=np.uint8)
+    if len(codes) == 0 or codes.max() >= 20:
+        return None
+    return codes
+
+
+def to_protein_sequence(s: str):
+    """
+    Creates a biotite ProteinSequence, setting the sequence code directly for canonical sequences.
+
+    Parameters:
+        s (str): amino acid sequence
+
+    Returns:
+        biotite.sequence.ProteinSequence: protein sequence
+    """
+    codes = encode_sequence(s)
+    if codes is None:
+        return seq.ProteinSequence(s)
+    protein = seq.ProteinSequence()
+    protein.code = codes
+    return protein
+
 
 #_____Sequence Constraints_____
 def length_constraint(seqs: list, max_len: int = 200):
@@ -26,13 +67,8 @@ def length_constraint(seqs: list, max_len: int = 200):
     Returns:
         np.array: Energy values
     """
-    energies = np.zeros(len(seqs))
-
-    for i, seq in enumerate(seqs):
-        if len(seq) > max_len:
-            energies[i] = float(len(seq) - max_len)
-        else:
-            energies[i] = 0.
+    lens = np.fromiter(map(len, seqs), dtype=np.int64, count=len(seqs))
+    energies = np.maximum(lens - max_len, 0).astype(np.float64)
 
     return energies
 
@@ -54,8 +90,8 @@ def seq_identity(seqs, ref, matrix="BLOSUM62", local=False):
     alph = seq.ProteinSequence.alphabet
     matrix = align.SubstitutionMatrix(alph, alph, matrix)
 
-    seqs = [seq.ProteinSequence(s) for s in seqs]
-    ref = seq.ProteinSequence(ref)
+    seqs = [to_protein_sequence(s) for s in seqs]
+    ref = to_protein_sequence(ref)
 
     scores = np.zeros(len(seqs))
     for i, s in enumerate(seqs):
@@ -95,15 +131,16 @@ def create_batched_sequence_datasest(
 
     yield batch_headers, batch_sequences
 
+
 def structure_prediction(
-        sequences: list, names: list, chunk_size: int = 124,
+        sequences: list, names: list = None, chunk_size: int = 124,
         max_tokens_per_batch: int = 1024, num_recycles: int = None):
     """
     Predict the structure of proteins.
 
     Parameters:
         sequences (list): all sequences for structure prediction
-        names (list): names of the sequences
+        names (list): names of the sequences. The indices of the sequences are used as headers if None.
         chunck_size (int): Chunks axial attention computation to reduce memory usage from O(L^2) to O(L). Recommended values: 128, 64, 32.
         max_tokens_per_batch (int): Maximum number of tokens per gpu forward-pass. This will group shorter sequences together.
         num_recycles (int): Number of recycles to run. Defaults to number used in training 4.
@@ -111,9 +148,9 @@ def structure_prediction(
     Returns:
         all_headers, all_sequences, all_pdbs, pTMs, mean_pLDDTs
     """
-    model = esm.pretrained.esmfold_v1()
-    model = model.eval().cuda()
-    model.set_chunk_size(chunk_size)
+    model = get_esmfold(chunk_size)
+    if names is None:
+        names = range(len(sequences))
     all_sequences = list(zip(names, sequences))
 
     batched_sequences = create_batched_sequence_datasest(all_sequences, max_tokens_per_batch)
@@ -5,11 +5,22 @@ __name__ = "proteusAI"
 __author__ = "Jonathan Funk"
 
 import os
-import random
+import io
+import time
+import tarfile
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import numpy as np
 from proteusAI.design_tools import Constraints
 import pandas as pd
 
+AAS_B = b'ACDEFGHIKLMNPQRSTVWY'
+AAS_ARR = np.frombuffer(AAS_B, dtype=np.uint8)
+N_AAS = len(AAS_B)
+
+MUT_TYPES = ('substitution', 'insertion', 'deletion')
+
 
 class ProteinDesign:
     """
@@ -34,6 +45,12 @@ class ProteinDesign:
             Default [0.6, 0.2, 0.2]
         pred_struc (bool): if True predict the structure of the protein at every step and use structure
             based constraints in the energy function. Default True.
+        converge_window (int): number of steps over which the energy is tracked for convergence. Sampling stops
+            early once the standard deviation of the energy over this window falls below converge_tol and the
+            temperature T / (1 + M * i) has decayed below converge_T, but not before 2 * converge_window steps.
+            Default None, which disables early stopping and always runs all steps
+        converge_tol (float): tolerance of the convergence check. Default 1e-3
+        converge_T (float): temperature below which sampling may stop early. Default 1.0
         max_len (int): maximum length sequence length for lenght constraint.
             Default 300.
         w_len (float): weight of length constraint.
@@ -54,7 +71,17 @@ class ProteinDesign:
             Default 0.02
         outdir (str): path to output directory.
             Default None
+        archive_pdbs (bool): if True the design structures are written into a single 'pdbs.tar' archive in outdir
+            instead of one file per design in 'pdbs'. Default False
         verbose (bool): if verbose print information
+        cache_size (int): number of evaluated sequences whose energies and structures are kept in a least recently
+            used cache. Revisited sequences and duplicate mutants are not folded again. 0 disables the cache.
+            Default 256
+        seed (int): seed of the random number generator used for all sampling.
+            Default None
+        n_jobs (int): number of worker processes used to evaluate the per-trajectory sequence and structure
+            constraints (alignment, SASA, all atom RMSD) in parallel. Structure prediction stays in the main process.
+            Default 1
     """
 
     def __init__(self,
@@ -67,6 +94,9 @@ class ProteinDesign:
                  M: float = 0.01,
                  mut_p: list = (0.6, 0.2, 0.2),
                  pred_struc: bool = True,
+                 converge_window: int = None,
+                 converge_tol: float = 1e-3,
+                 converge_T: float = 1.,
                  max_len: int = 300,
                  w_len: float=0.01,
                  w_identity: float = 0.1,
@@ -77,7 +107,11 @@ class ProteinDesign:
                  w_all_atm: float = 0.15,
                  w_sasa: float = 0.02,
                  outdir: str = None,
+                 archive_pdbs: bool = False,
                  verbose: bool = False,
+                 cache_size: int = 256,
+                 seed: int = None,
+                 n_jobs: int = 1,
                  ):
 
         if constraints is None:
@@ -90,6 +124,9 @@ class ProteinDesign:
         self.T = T
         self.M = M
         self.pred_struc = pred_struc
+        self.converge_window = converge_window
+        self.converge_tol = converge_tol
+        self.converge_T = converge_T
         self.max_len = max_len
         self.w_max_len = w_len
         self.w_identity = w_identity
@@ -97,16 +134,25 @@ class ProteinDesign:
         self.w_plddt = w_plddt
         self.w_globularity = w_globularity
         self.outdir = outdir
+        self.archive_pdbs = archive_pdbs
         self.verbose = verbose
         self.constraints = constraints
         self.w_sasa = w_sasa
         self.w_bb_coord = w_bb_coord
         self.w_all_atm = w_all_atm
+        self.cache_size = cache_size
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.n_jobs = n_jobs
 
         # Parameters
         self.ref_pdbs = None
         self.ref_constraints = None
         self.initial_energy = None
+        self._executor = None
+        self._fold_executor = None
+        self._pdb_archive = None
+        self._energy_cache = OrderedDict()
 
 
     def __str__(self):
@@ -159,98 +205,163 @@ class ProteinDesign:
         if mut_p is None:
             mut_p = [0.6, 0.2, 0.2]
 
-        AAs = ('A', 'C', 'D', 'E', 'F', 'G', 'H',
-               'I', 'K', 'L', 'M', 'N', 'P', 'Q',
-               'R', 'S', 'T', 'V', 'W', 'Y')
+        # draw mutation types, residues and positions for all sequences at once,
+        # weights do not need to be normalized
+        n = len(seqs)
+        p_cum = np.cumsum(mut_p)
+        mut_type_ids = np.searchsorted(p_cum, self.rng.random(n) * p_cum[-1], side='right').tolist()
+        residues = AAS_ARR[self.rng.integers(0, N_AAS, n)].tolist()
+        pos_u = self.rng.random(n)
 
-        mut_types = ('substitution', 'insertion', 'deletion')
+        # unconstrained positions, computed once per distinct state (usually all trajectories share one)
+        allowed = {}
 
         mutated_seqs = []
         mutated_constraints = []
         mutations = []
         for i, seq in enumerate(seqs):
             mut_constraints = {}
-
-            # loop until allowed mutation has been selected
-            mutate = True
-            while mutate:
-                pos = random.randint(0, len(seq) - 1)
-                mut_type = random.choices(mut_types, mut_p)[0]
-                if pos in constraints[i]['no_mut'] or pos in constraints[i]['all_atm']:
-                    pass
-                # secondary structure constraint disallows deletion
-                # insertions between two secondary structure constraints will have the constraint of their neighbors
-                else:
-                    break
+            mut_type = MUT_TYPES[mut_type_ids[i]]
+
+            # draw uniformly from the unconstrained positions
+            # secondary structure constraint disallows deletion
+            # insertions between two secondary structure constraints will have the constraint of their neighbors
+            state = (len(seq), tuple(constraints[i]['no_mut']), tuple(constraints[i]['all_atm']))
+            if state not in allowed:
+                allowed[state] = np.setdiff1d(np.arange(len(seq)), state[1] + state[2])
+                if len(allowed[state]) == 0:
+                    raise ValueError('All positions of the sequence are constrained, no mutation is possible')
+            candidates = allowed[state]
+            pos = int(candidates[int(pos_u[i] * len(candidates))])
+
+            # edit a mutable byte copy of the sequence in place
+            mut_seq = bytearray(seq, 'ascii')
 
             if mut_type == 'substitution':
-                replacement = random.choice(AAs)
-                mut_seq = ''.join([seq[:pos], replacement, seq[pos + 1:]])
+                replacement = residues[i]
+                mut_seq[pos] = replacement
                 for const in constraints[i].keys():
                     positions = constraints[i][const]
                     mut_constraints[const] = positions
-                mutations.append(f'sub:{seq[pos]}{pos}{replacement}')
+                mutations.append(f'sub:{seq[pos]}{pos}{chr(replacement)}')
 
             elif mut_type == 'insertion':
-                insertion = random.choice(AAs)
-                mut_seq = ''.join([seq[:pos], insertion, seq[pos:]])
+                insertion = residues[i]
+                mut_seq.insert(pos, insertion)
                 # shift constraints after insertion
                 for const in constraints[i].keys():
                     positions = constraints[i][const]
-                    positions = [i if i < pos else i + 1 for i in positions]
+                    positions = [p if p < pos else p + 1 for p in positions]
                     mut_constraints[const] = positions
-                mutations.append(f'ins:{pos}{insertion}')
+                mutations.append(f'ins:{pos}{chr(insertion)}')
 
             elif mut_type == 'deletion' and len(seq) > 1:
-                l = list(seq)
-                del l[pos]
-                mut_seq = ''.join(l)
+                del mut_seq[pos]
                 # shift constraints after deletion
                 for const in constraints[i].keys():
                     positions = constraints[i][const]
-                    positions = [i if i < pos else i - 1 for i in positions]
+                    positions = [p if p < pos else p - 1 for p in positions]
                     mut_constraints[const] = positions
                 mutations.append(f'del:{seq[pos]}{pos}')
 
             else:
                 # will perform insertion if length is to small
-                insertion = random.choice(AAs)
-                mut_seq = ''.join([seq[:pos], insertion, seq[pos:]])
+                insertion = residues[i]
+                mut_seq.insert(pos, insertion)
                 # shift constraints after insertion
                 for const in constraints[i].keys():
                     positions = constraints[i][const]
-                    positions = [i if i < pos else i + 1 for i in positions]
+                    positions = [p if p < pos else p + 1 for p in positions]
                     mut_constraints[const] = positions
-                mutations.append(f'ins:{pos}{insertion}')
+                mutations.append(f'ins:{pos}{chr(insertion)}')
 
-            mutated_seqs.append(mut_seq)
+            mutated_seqs.append(mut_seq.decode('ascii'))
             mutated_constraints.append(mut_constraints)
 
 
         return mutated_seqs, mutated_constraints, mutations
 
     ### ENERGY FUNCTION and ACCEPTANCE CRITERION
-    def energy_function(self, seqs: list, i: int, constraints: list):
+    def energy_function(self, seqs: list, i: int, constraints: list, out: np.ndarray = None):
         """
         Combines constraints into an energy function. The energy function
         returns the energy values of the mutated files and the associated pdb
         files as temporary files. In addition it returns a dictionary of the different
-        energies.
+        energies. Sequences which have been evaluated before with the same constraints
+        are taken from the cache.
 
         Parameters:
             seqs (list): list of sequences
             i (int): current iteration in sampling
             constraints (list): list of constraints
+            out (np.array): preallocated array of length len(seqs) to write the energies into.
+                A new array is allocated if None. Default None
+
+        Returns:
+            tuple: Energy value, pdbs, energy_log
+        """
+        # the reference structures are only set after the initial calculation
+        if self.cache_size == 0 or self.ref_pdbs is None:
+            return self._compute_energies(seqs, i, constraints, out=out)
+
+        keys = [(s, tuple((k, tuple(v)) for k, v in sorted(c.items()))) for s, c in zip(seqs, constraints)]
+
+        # evaluate every missing sequence once, also if it occurs multiple times in seqs
+        missing = {}
+        for n, key in enumerate(keys):
+            if key not in self._energy_cache and key not in missing:
+                missing[key] = n
+
+        if missing:
+            idx = list(missing.values())
+            _energies, _pdbs, _energy_log = self._compute_energies(
+                [seqs[n] for n in idx], i, [constraints[n] for n in idx]
+            )
+            for j, key in enumerate(missing):
+                terms = {term: values[j] for term, values in _energy_log.items() if term != 'iteration'}
+                self._energy_cache[key] = (_energies[j], _pdbs[j], terms)
+
+        energies = np.zeros(len(seqs)) if out is None else out
+        pdbs = []
+        energy_log = dict()
+        for n, key in enumerate(keys):
+            self._energy_cache.move_to_end(key)
+            energy, pdb, terms = self._energy_cache[key]
+            energies[n] = energy
+            pdbs.append(pdb)
+            for term, value in terms.items():
+                energy_log.setdefault(term, np.zeros(len(seqs)))[n] = value
+        energy_log['iteration'] = i + 1
+
+        while len(self._energy_cache) > self.cache_size:
+            self._energy_cache.popitem(last=False)
+
+        return energies, pdbs, energy_log
+
+    def _compute_energies(self, seqs: list, i: int, constraints: list, out: np.ndarray = None):
+        """
+        Evaluates the energy function for all sequences, see energy_function.
+
+        Parameters:
+            seqs (list): list of sequences
+            i (int): current iteration in sampling
+            constraints (list): list of constraints
+            out (np.array): preallocated array of length len(seqs) to write the energies into.
+                A new array is allocated if None. Default None
 
         Returns:
             tuple: Energy value, pdbs, energy_log
         """
         # reinitialize energy
-        energies = np.zeros(len(seqs))
+        if out is None:
+            energies = np.zeros(len(seqs))
+        else:
+            energies = out
+            energies.fill(0.)
         energy_log = dict()
 
         e_len = self.w_max_len * Constraints.length_constraint(seqs=seqs, max_len=self.max_len)
-        e_identity = self.w_identity * Constraints.seq_identity(seqs=seqs, ref=self.native_seq)
+        e_identity = self.w_identity * self._per_trajectory(Constraints.seq_identity, seqs, ref=self.native_seq)
 
         energies += e_len
         energies += e_identity
@@ -260,16 +371,15 @@ class ProteinDesign:
 
         pdbs = []
         if self.pred_struc:
-            # structure prediction
-            names = [f'sequence_{j}_cycle_{i}' for j in range(len(seqs))]
-            headers, sequences, pdbs, pTMs, mean_pLDDTs = Constraints.structure_prediction(seqs, names)
+            # structure prediction, the headers are not used
+            headers, sequences, pdbs, pTMs, mean_pLDDTs = Constraints.structure_prediction(seqs)
             pTMs = [1 - val for val in pTMs]
             mean_pLDDTs = [1 - val / 100 for val in mean_pLDDTs]
 
             e_pTMs = self.w_ptm * np.array(pTMs)
             e_mean_pLDDTs = self.w_plddt * np.array(mean_pLDDTs)
             e_globularity = self.w_globularity * Constraints.globularity(pdbs)
-            e_sasa = self.w_sasa * Constraints.surface_exposed_hydrophobics(pdbs)
+            e_sasa = self.w_sasa * self._per_trajectory(Constraints.surface_exposed_hydrophobics, pdbs)
 
             energies += e_pTMs
             energies += e_mean_pLDDTs
@@ -283,8 +393,11 @@ class ProteinDesign:
 
             # there are now ref pdbs before the first calculation
             if self.ref_pdbs is not None:
-                e_bb_coord = self.w_bb_coord * Constraints.backbone_coordination(pdbs, self.ref_pdbs)
-                e_all_atm = self.w_all_atm * Constraints.all_atom_coordination(pdbs, self.ref_pdbs, constraints, self.ref_constraints)
+                # all trajectories share the native reference, seqs may be a subset of the trajectories
+                ref_pdbs = self.ref_pdbs[:len(seqs)]
+                ref_constraints = self.ref_constraints[:len(seqs)]
+                e_bb_coord = self.w_bb_coord * Constraints.backbone_coordination(pdbs, ref_pdbs)
+                e_all_atm = self.w_all_atm * self._per_trajectory(Constraints.all_atom_coordination, pdbs, ref_pdbs, constraints, ref_constraints)
 
                 energies += e_bb_coord
                 energies += e_all_atm
@@ -299,12 +412,36 @@ class ProteinDesign:
 
         return energies, pdbs, energy_log
 
-    def p_accept(self, E_x_mut, E_x_i, T, i, M):
+    def _per_trajectory(self, constraint, *batches, **kwargs):
+        """
+        Evaluates a batched constraint. If worker processes are available the batch is split
+        into one chunk per worker and the results are concatenated in the original order.
+
+        Parameters:
+            constraint (function): constraint taking one or more lists of equal length
+            batches (list): lists which are split across workers
+            kwargs: arguments passed unchanged to every call
+
+        Returns:
+            np.array: constraint values
+        """
+        n = len(batches[0])
+        if self._executor is None or n < 2:
+            return constraint(*batches, **kwargs)
+
+        chunks = np.array_split(np.arange(n), min(self.n_jobs, n))
+        futures = [
+            self._executor.submit(constraint, *[[batch[j] for j in chunk] for batch in batches], **kwargs)
+            for chunk in chunks
+        ]
+        return np.concatenate([f.result() for f in futures])
+
+    def p_accept(self, E_x_mut, E_x_i, T, i, M, u=None):
         """
-        Decides to accep or reject changes. Changes which have a lower energy
-        than the previous state will always be accepted. Changes which have
-        higher energies will be accepted with a probability p_accept. The
-        acceptance probability for bad states decreases over time.
+        Decides to accept or reject changes (Metropolis criterion). Changes which
+        have a lower energy than the previous state will always be accepted. Changes
+        which have higher energies will be accepted with a probability exp(-dE/T).
+        The acceptance probability for bad states decreases over time.
 
         Parameters:
         -----------
@@ -313,22 +450,82 @@ class ProteinDesign:
             T (float): Temperature
             i (int): current itteration
             M (float): decay constant
+            u (np.array): uniform random numbers in (0, 1], one per change.
+                Drawn if None. Default None
 
         Returns:
         --------
-            np.array: accept probabilities
+            np.array: boolean mask of accepted changes
         """
         T = T / (1 + M * i)
-        dE = E_x_i - E_x_mut
-        exp_val = np.exp(1 / (T * dE))
-        p_accept = np.minimum(exp_val, np.ones_like(exp_val))
-        return p_accept
+        dE = np.asarray(E_x_mut) - np.asarray(E_x_i)
+        if u is None:
+            u = 1. - self.rng.random(len(dE))
+        # log-domain test log(u) < -dE/T
+        accept = (dE <= 0) | (np.log(u) < -dE / T)
+        return accept
+
+    def _save_structure(self, pdb, pdb_out, name):
+        """
+        Writes a design structure to the pdb output directory, or appends it
+        to the pdb archive if archive_pdbs is set.
+
+        Parameters:
+            pdb (biotite.structure.io.pdb.PDBFile): structure of the design
+            pdb_out (str): pdb output directory
+            name (str): file name of the structure
+        """
+        if self._pdb_archive is None:
+            pdb.write(os.path.join(pdb_out, name))
+            return
+
+        buffer = io.StringIO()
+        pdb.write(buffer)
+        data = buffer.getvalue().encode()
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = time.time()
+        self._pdb_archive.addfile(info, io.BytesIO(data))
+
+    def _start_workers(self):
+        """
+        Starts the worker processes for the constraints and the thread for the energy function.
+        """
+        if self.n_jobs > 1:
+            # spawn, the parent process holds a CUDA context once ESMFold is loaded
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.n_jobs, mp_context=multiprocessing.get_context('spawn')
+            )
+        # energies are evaluated in a background thread while the next mutations are proposed
+        self._fold_executor = ThreadPoolExecutor(max_workers=1)
+
+    def _stop_workers(self):
+        """
+        Shuts down the workers started by _start_workers and closes the structure archive.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._fold_executor is not None:
+            self._fold_executor.shutdown()
+            self._fold_executor = None
+        if self._pdb_archive is not None:
+            self._pdb_archive.close()
+            self._pdb_archive = None
 
     ### RUN
     def run(self):
         """
         Runs MCMC-sampling based on user defined inputs. Returns optimized sequences.
         """
+        self._start_workers()
+        try:
+            return self._run()
+        finally:
+            self._stop_workers()
+
+    def _run(self):
+        self._energy_cache.clear()
         native_seq = self.native_seq
         constraints = self.constraints
         n_traj = self.n_traj
@@ -353,6 +550,8 @@ class ProteinDesign:
                 os.mkdir(png_out)
             if not os.path.exists(data_out):
                 os.mkdir(data_out)
+            if self.pred_struc and self.archive_pdbs:
+                self._pdb_archive = tarfile.open(os.path.join(outdir, 'pdbs.tar'), 'w')
 
         if sampler == 'simulated_annealing':
             mutate = self.mutate
@@ -367,7 +566,7 @@ class ProteinDesign:
         # for initial calculation don't use the full sequences, unecessary
         # calculation of initial state
         E_x_i, pdbs, energy_log = energy_function([seqs[0]], -1, [constraints[0]])
-        E_x_i = [E_x_i[0] for _ in range(n_traj)]
+        E_x_i = np.full(n_traj, E_x_i[0])
         pdbs = [pdbs[0] for _ in range(n_traj)]
 
         # empty energies dictionary for the first run
@@ -384,47 +583,72 @@ class ProteinDesign:
         if self.pred_struc and outdir is not None:
             # saves the n th structure
             num = '{:0{}d}'.format(len(energy_log['iteration']), len(str(self.steps)))
-            pdbs[0].write(os.path.join(pdb_out, f'{num}_design.pdb'))
+            self._save_structure(pdbs[0], pdb_out, f'{num}_design.pdb')
 
-        # write energy_log in data_out
+        # write energy_log header in data_out, rows are appended after every accepted step
         if outdir is not None:
             df = pd.DataFrame(energy_log)
             df.to_csv(os.path.join(data_out, f'energy_log.pdb'), index=False)
 
+        # energies of the mutants are written into the same buffer every step
+        E_buf = np.zeros(n_traj)
+
+        # uniform random numbers for all acceptance tests, in (0, 1]
+        u = 1. - self.rng.random((steps, n_traj))
+
+        # energies of the last steps for the convergence check
+        E_history = deque(maxlen=self.converge_window)
+
+        proposal = mutate(seqs, mut_p, constraints)
         for i in range(steps):
-            mut_seqs, _constraints, mutations = mutate(seqs, mut_p, constraints)
-            E_x_mut, pdbs_mut, _energy_log = energy_function(mut_seqs, i, _constraints)
+            if self.converge_window:
+                E_history.append(E_x_i.min())
+                # only stop on a plateau once the temperature is low enough that the sampler cannot escape it
+                if (i >= 2 * self.converge_window and T / (1 + M * i) < self.converge_T
+                        and np.std(E_history) < self.converge_tol):
+                    if self.verbose:
+                        print(f'Energy converged after {i} steps')
+                    break
+
+            mut_seqs, _constraints, mutations = proposal
+
+            # only evaluate mutants which differ from their current sequence,
+            # unchanged trajectories keep their state and cannot yield a new design
+            changed = [n for n in range(n_traj) if mut_seqs[n] != seqs[n]]
+            if len(changed) == 0:
+                proposal = mutate(seqs, mut_p, constraints)
+                continue
+
+            energies = self._fold_executor.submit(
+                energy_function,
+                [mut_seqs[n] for n in changed], i, [_constraints[n] for n in changed], out=E_buf[:len(changed)]
+            )
+            # propose the next mutations during structure prediction, they are kept if the state does not change
+            proposal = mutate(seqs, mut_p, constraints)
+            E_x_mut, pdbs_mut, _energy_log = energies.result()
+
             # accept or reject change
-            p = p_accept(E_x_mut, E_x_i, T, i, M)
-
-            new_struc_found = False
-            accepted_ind = [] # indices of accepted structures
-            for n in range(n_traj):
-                if p[n] > random.random():
-                    accepted_ind.append(n)
-                    E_x_i[n] = E_x_mut[n]
-                    seqs[n] = mut_seqs[n]
-                    constraints[n] = _constraints[n]
-                    new_struc_found = True
-
-            if new_struc_found:
-                # get index of lowest energie sructure out of the newly found structures
-                min_E = accepted_ind[0]
-                for a in accepted_ind:
-                    if a < min_E:
-                        min_E = a
+            accepted_ind = np.flatnonzero(p_accept(E_x_mut, E_x_i[changed], T, i, M, u[i, changed]))
+
+            if len(accepted_ind) > 0:
+                # get index of lowest energy structure out of the newly found structures
+                best = accepted_ind[np.argmin(E_x_mut[accepted_ind])]
+                min_E = changed[best]
 
                 # update all to lowest energy structure
-                E_x_i = [E_x_i[min_E] for _ in range(n_traj)]
-                seqs = [seqs[min_E] for _ in range(n_traj)]
-                constraints = [constraints[min_E] for _ in range(n_traj)]
-                pdbs = [pdbs_mut[min_E] for _ in range(n_traj)]
+                E_x_i.fill(E_x_mut[best])
+                seqs = [mut_seqs[min_E] for _ in range(n_traj)]
+                constraints = [_constraints[min_E] for _ in range(n_traj)]
+                pdbs = [pdbs_mut[best] for _ in range(n_traj)]
+
+                # the proposal was drawn from the previous state
+                proposal = mutate(seqs, mut_p, constraints)
 
                 for key in energy_log.keys():
                     # skip skalar values in this step
                     if key not in ['T', 'M', 'iteration', 'mut', 'description']:
                         e = _energy_log[key]
-                        energy_log[key].append(e[min_E].item())
+                        energy_log[key].append(e[best].item())
 
                 energy_log['iteration'].append(i)
                 energy_log['T'].append(T)
@@ -436,11 +660,11 @@ class ProteinDesign:
 
                 if self.pred_struc and outdir is not None:
                     # saves the n th structure
-                    pdbs[0].write(os.path.join(pdb_out, f'{num}_design.pdb'))
+                    self._save_structure(pdbs[0], pdb_out, f'{num}_design.pdb')
 
-                # write energy_log in data_out
+                # append the new row to the energy_log in data_out
                 if outdir is not None:
-                    df = pd.DataFrame(energy_log)
-                    df.to_csv(os.path.join(data_out, f'energy_log.pdb'), index=False)
+                    df = pd.DataFrame({key: values[-1:] for key, values in energy_log.items()})
+                    df.to_csv(os.path.join(data_out, f'energy_log.pdb'), mode='a', header=False, index=False)
 
         return (seqs)
\ No newline at end of file
@@ -36,4 +36,108 @@ def load_embeddings(path: str, names: Union[list, None] = None, map_location: st
             t = torch.load(os.path.join(path, name), map_location=map_location)
             tensors.append(t)
 
-    return names, tensors
\ No newline at end of file
+    return names, tensors
+
+def load_embedding_store(path: str, names: list, keep: Union[set, None] = None, store: Union[dict, None] = None, save: bool = True, map_location: str = 'cpu') -> tuple:
+    """
+    Loads representations through a single stacked store kept in a hidden directory next to
+    the representations directory (e.g. 'rep/.store/esm2.pt' for 'rep/esm2/'). Representations
+    that are missing from the store, or whose file changed since they were stored, are read
+    from their individual files. The store is kept as float32, so models can use it without
+    converting it again. An unreadable store (e.g. from an interrupted write) is rebuilt from
+    the representation files.
+
+    Parameters:
+        path (str): path to directory containing representations files
+        names (list): names of the proteins (without the '.pt' extension) to load
+        keep (set): names whose representations are added to the store. Others are loaded
+            from their files without being stored. Default None stores all
+        store (dict): store returned by a previous call, avoids reading it from disk again. Default None
+        save (bool): write the store to disk if it changed. Set to False to collect the changes of
+            several calls and write them once with save_embedding_store. Default True
+        map_location (str): device to load the store to. Default 'cpu'
+
+    Returns:
+        tuple: stacked representations in the order of names and the updated store
+
+    Example:
+        reps, store = load_embedding_store('/path/to/representations', names)
+        reps, store = load_embedding_store('/path/to/representations', more_names, store=store)
+    """
+
+    path = os.path.normpath(path)
+    store_file = os.path.join(os.path.dirname(path), '.store', os.path.basename(path) + '.pt')
+
+    if store is None and os.path.exists(store_file):
+        try:
+            store = torch.load(store_file, map_location=map_location)
+        except Exception:
+            store = None  # rebuilt from the representation files
+    if store is None:
+        store = {'names': [], 'mtimes': [], 'reps': None}
+
+    index = {name: i for i, name in enumerate(store['names'])}
+
+    # files that are not in the store or were recomputed after they were stored
+    mtimes = {name: os.path.getmtime(os.path.join(path, name + '.pt')) for name in names}
+    stale = [name for name, mtime in mtimes.items() if name not in index or store['mtimes'][index[name]] != mtime]
+
+    loaded, update = {}, []
+    if stale:
+        _, tensors = load_embeddings(path, names=[name + '.pt' for name in stale], map_location=map_location)
+        loaded = {name: t.float() for name, t in zip(stale, tensors)}
+
+        update = {name for name in stale if keep is None or name in keep}
+        if update:
+            new_names = [name for name in stale if name in update and name not in index]
+            for name in update:
+                if name in index:
+                    store['reps'][index[name]] = loaded[name]
+                    store['mtimes'][index[name]] = mtimes[name]
+
+            if new_names:
+                new_reps = torch.stack([loaded[name] for name in new_names])
+                store['reps'] = new_reps if store['reps'] is None else torch.cat([store['reps'], new_reps])
+                for name in new_names:
+                    index[name] = len(store['names'])
+                    store['names'].append(name)
+                    store['mtimes'].append(mtimes[name])
+
+            store['changed'] = True
+
+    if save:
+        save_embedding_store(path, store)
+
+    # rows that were reloaded but not stored are served from their files
+    if all(name in index and (name not in loaded or name in update) for name in names):
+        reps = store['reps'][torch.tensor([index[name] for name in names], dtype=torch.long)]
+    else:
+        reps = torch.stack([loaded[name] if name in loaded else store['reps'][index[name]] for name in names])
+
+    return reps, store
+
+def save_embedding_store(path: str, store: dict):
+    """
+    Writes a store returned by load_embedding_store if it changed since it was last written.
+    The store is written to a temporary file first, so an interrupted write never replaces
+    the previous store.
+
+    Parameters:
+        path (str): path to directory containing representations files
+        store (dict): store returned by load_embedding_store
+
+    Example:
+        reps, store = load_embedding_store('/path/to/representations', names, save=False)
+        save_embedding_store('/path/to/representations', store)
+    """
+
+    if not store.pop('changed', False):
+        return
+
+    path = os.path.normpath(path)
+    store_file = os.path.join(os.path.dirname(path), '.store', os.path.basename(path) + '.pt')
+    os.makedirs(os.path.dirname(store_file), exist_ok=True)
+
+    tmp_file = store_file + '.tmp'
+    torch.save(store, tmp_file)
+    os.replace(tmp_file, store_file)
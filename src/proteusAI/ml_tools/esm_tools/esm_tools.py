@@ -4,12 +4,7 @@
 __name__ = "proteusAI"
 __author__ = "Jonathan Funk"
 
-# Quick fix remove later
-import sys
 from pathlib import Path
-
-sys.path.append(str(Path(__file__).resolve().parent.parent.parent.parent))
-
 import torch
 import torch.nn.functional as F
 import esm
@@ -602,6 +597,38 @@ def create_batched_sequence_datasest(
     yield batch_headers, batch_sequences
 
 
+# ESMFold is loaded once per process and shared by all structure predictions
+_esmfold_model = None
+
+def get_esmfold(chunk_size: int = 124):
+    """
+    Returns the shared ESMFold model, loading it onto the GPU on the first call.
+    Free it with release_esmfold once no more structures are predicted.
+
+    Args:
+        chunk_size (int): Chunks axial attention computation to reduce memory usage from O(L^2) to O(L).
+
+    Returns:
+        ESMFold model in eval mode
+    """
+    global _esmfold_model
+    if _esmfold_model is None:
+        _esmfold_model = esm.pretrained.esmfold_v1().eval().cuda()
+    _esmfold_model.set_chunk_size(chunk_size)
+    return _esmfold_model
+
+
+def release_esmfold():
+    """
+    Releases the shared ESMFold model and the GPU memory it holds. The model is
+    loaded again by the next structure prediction.
+    """
+    global _esmfold_model
+    _esmfold_model = None
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
 def structure_prediction(
         seqs: list, names: list=None, chunk_size: int = 124,
         max_tokens_per_batch: int = 1024, num_recycles: int = None, pbar = None):
@@ -622,9 +649,7 @@ def structure_prediction(
     """
     if pbar:
         pbar.set(message="Loading model weights")
-    model = esm.pretrained.esmfold_v1()
-    model = model.eval().cuda()
-    model.set_chunk_size(chunk_size)
+    model = get_esmfold(chunk_size)
 
     if names == None:
         names = [f'seq{i}' for i in range(len(seqs))]
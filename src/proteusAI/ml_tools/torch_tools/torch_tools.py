@@ -1,5 +1,6 @@
 import torch
 import os
+import importlib.util
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -186,11 +187,30 @@ def plot_attention(attention: list, layer: int, head: int, seq: Union[str, list]
     # Show the plot
     plt.show()
 
+def rbf_kernel(n: int, keops_threshold: Union[int, None] = None):
+    """
+    Returns an RBF kernel. For large training sets the KeOps kernel can be used if pykeops
+    is installed, which avoids materializing the full covariance matrix. KeOps compiles its
+    kernels on first use, which requires a working compiler toolchain.
+
+    Parameters:
+        n (int): number of training points.
+        keops_threshold (int): minimum number of training points to use KeOps. Default None,
+            which always uses the dense kernel.
+
+    Returns:
+        gpytorch.kernels.Kernel: RBF kernel.
+    """
+    if keops_threshold is not None and n >= keops_threshold and importlib.util.find_spec('pykeops') is not None:
+        return gpytorch.kernels.keops.RBFKernel()
+
+    return gpytorch.kernels.RBFKernel()
+
 class GP(gpytorch.models.ExactGP):
-    def __init__(self, train_x, train_y, likelihood, fix_mean=False): #special method: instantiate object
+    def __init__(self, train_x, train_y, likelihood, fix_mean=False, keops_threshold=None): #special method: instantiate object
         super(GP, self).__init__(train_x, train_y, likelihood)
         self.mean_module = gpytorch.means.ConstantMean() #attribute
-        self.covar_module = gpytorch.kernels.ScaleKernel(gpytorch.kernels.RBFKernel())
+        self.covar_module = gpytorch.kernels.ScaleKernel(rbf_kernel(len(train_x), keops_threshold))
         self.mean_module.constant.data.fill_(1)  # Set the mean value to 1
         if fix_mean:
             self.mean_module.constant.requires_grad_(False)
@@ -199,11 +219,59 @@ class GP(gpytorch.models.ExactGP):
         covar_x = self.covar_module(x)
         return gpytorch.distributions.MultivariateNormal(mean_x, covar_x)
 
-def predict_gp(model, likelihood, X):
+class _MeanVarGP(torch.nn.Module):
+    """Wraps a GP and its likelihood to return the predictive mean and variance as tensors."""
+    def __init__(self, model, likelihood):
+        super(_MeanVarGP, self).__init__()
+        self.model = model
+        self.likelihood = likelihood
+
+    def forward(self, x):
+        predictions = self.likelihood(self.model(x))
+        return predictions.mean, predictions.variance
+
+def trace_gp(model, likelihood, X):
+    """
+    Traces the predictive mean and variance of a trained GP with TorchScript,
+    which removes the Python overhead of repeated predictions. GPyTorch can only
+    trace fast (LOVE) predictive variances. The traced module accepts inputs with
+    any number of rows.
+
+    Parameters:
+        model (GP): trained GP model.
+        likelihood (gpytorch.likelihoods.Likelihood): trained likelihood.
+        X (torch.Tensor): example input used for tracing, e.g. the training inputs.
+
+    Returns:
+        torch.jit.ScriptModule: traced module returning mean and variance, None if the
+            training set has fewer than two points.
+    """
+    model.eval()
+    likelihood.eval()
+
+    # the kernels branch on torch.equal(x1, x2), an example with as many rows as the
+    # training set would trace the train-train covariance
+    n_train = model.train_inputs[0].shape[-2]
+    if n_train < 2:
+        return None
+    X = X[:n_train - 1] if len(X) >= n_train else X
+
+    with torch.no_grad(), gpytorch.settings.fast_pred_var(), gpytorch.settings.trace_mode():
+        model(X)  # compute the prediction caches before tracing
+        traced = torch.jit.trace(_MeanVarGP(model, likelihood), X, check_trace=False)
+
+    return traced
+
+def predict_gp(model, likelihood, X, traced=None, fast=False):
     model.eval()
     likelihood.eval()
 
-    with torch.no_grad():
+    if traced is not None:
+        with torch.no_grad(), gpytorch.settings.trace_mode():
+            y_pred, y_var = traced(X)
+        return y_pred, y_var.sqrt()
+
+    with torch.no_grad(), gpytorch.settings.fast_pred_var(fast):
         predictions = likelihood(model(X))
         y_pred = predictions.mean
         y_std = predictions.stddev
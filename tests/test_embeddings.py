@@ -0,0 +1,89 @@
+import os
+
+import torch
+
+from proteusAI.io_tools import load_embedding_store, save_embedding_store
+
+
+def write_reps(path, reps):
+    os.makedirs(path, exist_ok=True)
+    for name, value in reps.items():
+        torch.save(torch.full((3,), value), os.path.join(path, name + '.pt'))
+
+
+def test_store_is_hidden_next_to_the_representations(tmp_path):
+    path = os.path.join(tmp_path, 'rep', 'esm2')
+    write_reps(path, {'a': 1., 'b': 2.})
+
+    reps, _ = load_embedding_store(path, ['b', 'a'])
+
+    torch.testing.assert_close(reps[:, 0], torch.tensor([2., 1.]))
+    assert os.path.exists(os.path.join(tmp_path, 'rep', '.store', 'esm2.pt'))
+    assert sorted(os.listdir(path)) == ['a.pt', 'b.pt']
+    assert [d for d in os.listdir(os.path.join(tmp_path, 'rep')) if not d.startswith('.')] == ['esm2']
+
+
+def test_store_is_reused_and_refreshed(tmp_path):
+    path = os.path.join(tmp_path, 'rep', 'esm2')
+    write_reps(path, {'a': 1., 'b': 2.})
+    _, store = load_embedding_store(path, ['a', 'b'])
+
+    # a new session reads the store from disk
+    reps, store = load_embedding_store(path, ['a', 'b'])
+    torch.testing.assert_close(reps[:, 0], torch.tensor([1., 2.]))
+
+    # recomputed representations replace the stored ones
+    write_reps(path, {'a': 5.})
+    os.utime(os.path.join(path, 'a.pt'), (0, 1))
+    reps, store = load_embedding_store(path, ['a', 'b'], store=store)
+    torch.testing.assert_close(reps[:, 0], torch.tensor([5., 2.]))
+
+    reps, _ = load_embedding_store(path, ['a'])
+    torch.testing.assert_close(reps[:, 0], torch.tensor([5.]))
+
+
+def test_store_only_keeps_requested_names(tmp_path):
+    path = os.path.join(tmp_path, 'rep', 'esm2')
+    write_reps(path, {'a': 1., 'b': 2., 'variant': 3.})
+    _, store = load_embedding_store(path, ['a', 'b'], keep={'a', 'b'})
+
+    reps, store = load_embedding_store(path, ['variant', 'a'], keep={'a', 'b'}, store=store)
+
+    torch.testing.assert_close(reps[:, 0], torch.tensor([3., 1.]))
+    assert store['names'] == ['a', 'b']
+    assert torch.load(os.path.join(tmp_path, 'rep', '.store', 'esm2.pt'))['names'] == ['a', 'b']
+
+
+def test_corrupt_store_is_rebuilt(tmp_path):
+    path = os.path.join(tmp_path, 'rep', 'esm2')
+    store_file = os.path.join(tmp_path, 'rep', '.store', 'esm2.pt')
+    write_reps(path, {'a': 1., 'b': 2.})
+    load_embedding_store(path, ['a', 'b'])
+
+    # e.g. a write that was interrupted
+    with open(store_file, 'r+b') as f:
+        f.truncate(10)
+
+    reps, store = load_embedding_store(path, ['a', 'b'])
+
+    torch.testing.assert_close(reps[:, 0], torch.tensor([1., 2.]))
+    assert torch.load(store_file)['names'] == ['a', 'b']
+
+
+def test_store_is_written_once_and_only_if_changed(tmp_path):
+    path = os.path.join(tmp_path, 'rep', 'esm2')
+    store_file = os.path.join(tmp_path, 'rep', '.store', 'esm2.pt')
+    write_reps(path, {'a': 1., 'b': 2., 'c': 3.})
+
+    _, store = load_embedding_store(path, ['a'], save=False)
+    _, store = load_embedding_store(path, ['b', 'c'], store=store, save=False)
+    assert not os.path.exists(store_file)
+
+    save_embedding_store(path, store)
+    assert torch.load(store_file)['names'] == ['a', 'b', 'c']
+    assert os.listdir(os.path.dirname(store_file)) == ['esm2.pt']
+
+    # loading known representations does not rewrite the store
+    os.utime(store_file, (0, 1))
+    load_embedding_store(path, ['c', 'a'], store=store)
+    assert os.path.getmtime(store_file) == 1
@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+
+from proteusAI.design_tools import Constraints
+from proteusAI.design_tools.MCMC import ProteinDesign
+
+SEQ = 'ACDEFGHIKL'
+
+
+def fake_energies(calls, energy=1.):
+    """Energy function that records the evaluated sequences and returns a constant energy."""
+    def _compute_energies(seqs, i, constraints, out=None):
+        calls.append((i, list(seqs)))
+        energies = np.full(len(seqs), energy) if out is None else out
+        energies.fill(energy)
+        return energies, [f'pdb_{s}' for s in seqs], {'e_len x 1': np.zeros(len(seqs)), 'iteration': i + 1}
+    return _compute_energies
+
+
+def test_mutate_draws_uniformly_from_unconstrained_positions():
+    design = ProteinDesign(native_seq=SEQ, seed=0)
+    constraints = {'no_mut': [0, 1, 2], 'all_atm': [5]}
+    n = 7000
+
+    _, _, mutations = design.mutate([SEQ] * n, mut_p=(1, 0, 0), constraints=[constraints] * n)
+
+    positions = [int(m[5:-1]) for m in mutations]
+    counts = np.bincount(positions, minlength=len(SEQ))
+    allowed = [3, 4, 6, 7, 8, 9]
+
+    assert counts[[0, 1, 2, 5]].sum() == 0
+    expected = n / len(allowed)
+    assert np.all(np.abs(counts[allowed] - expected) < 0.1 * expected)
+
+
+def test_mutate_shifts_constraints_on_insertion():
+    design = ProteinDesign(native_seq=SEQ, seed=1)
+    constraints = {'no_mut': [4], 'all_atm': []}
+
+    seqs, mut_constraints, mutations = design.mutate([SEQ] * 50, mut_p=(0, 1, 0), constraints=[constraints] * 50)
+
+    for seq, const, mut in zip(seqs, mut_constraints, mutations):
+        pos = int(mut[4:-1])
+        assert len(seq) == len(SEQ) + 1
+        assert const['no_mut'] == ([4] if pos > 4 else [5])
+
+
+def test_mutate_raises_if_all_positions_are_constrained():
+    design = ProteinDesign(native_seq='ACD', seed=0)
+    constraints = {'no_mut': [0, 1], 'all_atm': [2]}
+
+    with pytest.raises(ValueError):
+        design.mutate(['ACD'], constraints=[constraints])
+
+
+def test_p_accept():
+    design = ProteinDesign(native_seq=SEQ, seed=0)
+    E_x_i = np.zeros(4)
+    E_x_mut = np.array([-1., 0., 1., 1.])
+    u = np.array([1., 1., np.exp(-2.), np.exp(-0.5)])
+
+    accept = design.p_accept(E_x_mut, E_x_i, T=1., i=0, M=0., u=u)
+
+    # lower and equal energies are always accepted, higher ones if log(u) < -dE/T
+    np.testing.assert_array_equal(accept, [True, True, True, False])
+
+
+def test_p_accept_decays_temperature():
+    design = ProteinDesign(native_seq=SEQ, seed=0)
+    u = np.array([np.exp(-1.5)])
+
+    assert design.p_accept([1.], [0.], T=1., i=0, M=1., u=u)[0]
+    assert not design.p_accept([1.], [0.], T=1., i=1, M=1., u=u)[0]
+
+
+def test_energy_function_caches_evaluated_sequences(monkeypatch):
+    design = ProteinDesign(native_seq=SEQ, cache_size=2)
+    calls = []
+    monkeypatch.setattr(design, '_compute_energies', fake_energies(calls))
+    constraints = {'no_mut': [], 'all_atm': []}
+
+    # without reference structures the cache is bypassed
+    design.energy_function(['AAA'], -1, [constraints])
+    assert calls == [(-1, ['AAA'])]
+
+    design.ref_pdbs = ['pdb_AAA']
+    energies, pdbs, energy_log = design.energy_function(['AAA', 'CCC', 'AAA'], 0, [constraints] * 3)
+    assert calls[-1] == (0, ['AAA', 'CCC'])
+    assert pdbs == ['pdb_AAA', 'pdb_CCC', 'pdb_AAA']
+    np.testing.assert_array_equal(energies, [1., 1., 1.])
+    assert energy_log['iteration'] == 1
+
+    # cached sequences are not evaluated again
+    design.energy_function(['CCC', 'AAA'], 1, [constraints] * 2)
+    assert len(calls) == 2
+
+    # the same sequence with other constraints is a different state
+    design.energy_function(['AAA'], 2, [{'no_mut': [0], 'all_atm': []}])
+    assert calls[-1] == (2, ['AAA'])
+
+    # the least recently used sequence was evicted
+    design.energy_function(['CCC'], 3, [constraints])
+    assert calls[-1] == (3, ['CCC'])
+
+
+def test_run_stops_early_once_converged(monkeypatch, tmp_path):
+    design = ProteinDesign(native_seq=SEQ, n_traj=2, steps=500, pred_struc=False, outdir=str(tmp_path),
+                           converge_window=10, converge_T=100., seed=0)
+    calls = []
+    monkeypatch.setattr(design, '_compute_energies', fake_energies(calls))
+
+    design.run()
+
+    assert max(i for i, _ in calls) < 2 * design.converge_window
+
+
+def test_run_does_not_stop_early_while_hot(monkeypatch, tmp_path):
+    design = ProteinDesign(native_seq=SEQ, n_traj=2, steps=100, pred_struc=False, outdir=str(tmp_path),
+                           converge_window=10, converge_T=1e-3, cache_size=0, seed=0)
+    calls = []
+    monkeypatch.setattr(design, '_compute_energies', fake_energies(calls))
+
+    design.run()
+
+    assert max(i for i, _ in calls) == design.steps - 1
+
+
+def test_per_trajectory_in_worker_processes():
+    design = ProteinDesign(native_seq=SEQ, n_jobs=2)
+    seqs = ['A' * n for n in range(1, 8)]
+
+    design._start_workers()
+    try:
+        energies = design._per_trajectory(Constraints.length_constraint, seqs, max_len=3)
+    finally:
+        design._stop_workers()
+
+    np.testing.assert_array_equal(energies, Constraints.length_constraint(seqs, max_len=3))
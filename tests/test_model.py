@@ -0,0 +1,114 @@
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from proteusAI import Library, Model
+
+
+@pytest.fixture
+def library(tmp_path):
+    rng = np.random.default_rng(0)
+    aas = list('ACDEFGHIKLMNPQRSTVWY')
+    df = pd.DataFrame({
+        'name': [f'p{i}' for i in range(40)],
+        'seq': [''.join(rng.choice(aas, 8)) for _ in range(40)],
+        'y': rng.normal(size=40),
+    })
+    source = os.path.join(tmp_path, 'data.csv')
+    df.to_csv(source, index=False)
+
+    user = os.path.join(tmp_path, 'usr')
+    os.makedirs(user)
+    return Library(user=user, source=source, seqs_col='seq', names_col='name', y_col='y', y_type='num')
+
+
+def test_k_fold_ensemble(library, tmp_path):
+    model = Model(library=library, model_type='rf', x='ohe', k_folds=3, seed=42, dest=os.path.join(tmp_path, 'out'))
+    model.train()
+
+    assert len(model._model) == 3
+    # folds are fitted single threaded, the fitted models predict on all cores again
+    assert [m.n_jobs for m in model._model] == [-1, -1, -1]
+
+    x = model.load_representations(model.val_data).numpy()
+    y_stack = np.stack([m.predict(x) for m in model._model])
+    np.testing.assert_allclose(model.y_val_pred, y_stack.mean(axis=0), rtol=1e-6)
+    np.testing.assert_allclose(model.y_val_sigma, y_stack.std(axis=0), rtol=1e-6, atol=1e-12)
+
+
+def write_reps(library, rep, dim=16):
+    rng = np.random.default_rng(1)
+    path = os.path.join(library.rep_path, rep)
+    os.makedirs(path, exist_ok=True)
+    for protein in library.proteins:
+        # quarter steps are exact in float16
+        torch.save(torch.tensor(rng.integers(-8, 8, dim) / 4, dtype=torch.float32), os.path.join(path, protein.name + '.pt'))
+
+
+def test_half_precision_predictions_match_float32(library, tmp_path):
+    write_reps(library, 'esm2')
+    model = Model(library=library, model_type='ridge', x='esm2', seed=42, dest=os.path.join(tmp_path, 'out'))
+    model.train()
+
+    _, y_pred, _, _, _ = model.predict(library.proteins, batch_size=7)
+    model.half_precision = True
+    _, y_pred_half, _, _, _ = model.predict(library.proteins, batch_size=7)
+
+    np.testing.assert_allclose(y_pred_half, y_pred)
+
+
+def test_half_precision_warns_for_encodings(library, tmp_path):
+    model = Model(library=library, model_type='ridge', x='ohe', seed=42, dest=os.path.join(tmp_path, 'out'))
+    model.train()
+    model.half_precision = True
+
+    with pytest.warns(UserWarning, match='half_precision'):
+        model.predict(library.proteins)
+
+
+def test_compile_model_without_hummingbird(library, tmp_path):
+    if importlib.util.find_spec('hummingbird') is not None:
+        pytest.skip('hummingbird is installed')
+    model = Model(library=library, model_type='ridge', x='ohe', compile_model=True, dest=os.path.join(tmp_path, 'out'))
+
+    with pytest.raises(ImportError, match='pip install hummingbird-ml'):
+        model.train()
+
+
+@pytest.mark.parametrize('model_type', ['rf', 'knn'])
+def test_forests_and_neighbours_use_all_cores(library, tmp_path, model_type):
+    model = Model(library=library, model_type=model_type, x='ohe', dest=os.path.join(tmp_path, 'out'))
+
+    assert model.model().n_jobs == -1
+    assert model.model(n_jobs=2).n_jobs == 2
+
+
+def test_split_data_is_deterministic(library, tmp_path):
+    def split(seed):
+        model = Model(library=library, x='ohe', split=(80, 10, 10), seed=seed, dest=os.path.join(tmp_path, 'out'))
+        return [[protein.name for protein in data] for data in model.split_data()]
+
+    train, test, val = split(42)
+
+    assert (len(train), len(test), len(val)) == (32, 4, 4)
+    assert sorted(train + test + val) == sorted(protein.name for protein in library.proteins)
+    assert split(42) == [train, test, val]
+    assert split(7) != [train, test, val]
+
+
+def test_save_to_csv(library, tmp_path):
+    model = Model(library=library, x='ohe', dest=os.path.join(tmp_path, 'out'))
+    proteins = library.proteins[:3]
+    filename = os.path.join(tmp_path, 'predictions.csv')
+
+    model.save_to_csv(proteins, [1., 2., 3.], [1.5, 2.5, 3.5], [0.1, 0.2, 0.3], filename, acq_scores=[3, 2, 1])
+
+    df = pd.read_csv(filename)
+    assert list(df.columns) == ['name', 'sequence', 'y_value', 'y_predicted', 'y_sigma', 'acq_score']
+    assert list(df['name']) == [protein.name for protein in proteins]
+    assert list(df['sequence']) == [protein.seq for protein in proteins]
+    np.testing.assert_allclose(df['y_predicted'], [1.5, 2.5, 3.5])
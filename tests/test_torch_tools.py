@@ -0,0 +1,77 @@
+import gpytorch
+import pytest
+import torch
+
+from proteusAI import Model
+from proteusAI.ml_tools.torch_tools import GP, predict_gp, rbf_kernel, trace_gp
+
+
+@pytest.fixture
+def gp():
+    torch.manual_seed(0)
+    x_train = torch.randn(50, 4)
+    y_train = x_train.sum(1) + 0.1 * torch.randn(50)
+    likelihood = gpytorch.likelihoods.GaussianLikelihood()
+    model = GP(x_train, y_train, likelihood)
+    return model, likelihood, x_train
+
+
+@pytest.mark.parametrize('n', [1, 13, 50, 200])
+def test_traced_gp_matches_eager_prediction(gp, n):
+    model, likelihood, x_train = gp
+    traced = trace_gp(model, likelihood, x_train)
+    X = torch.randn(n, 4)
+
+    with torch.no_grad(), gpytorch.settings.trace_mode():
+        y_pred, y_var = traced(X)
+    y_pred_eager, y_std_eager = predict_gp(model, likelihood, X, fast=True)
+
+    torch.testing.assert_close(y_pred, y_pred_eager)
+    torch.testing.assert_close(y_var.sqrt(), y_std_eager)
+
+
+def test_traced_gp_predicts_training_inputs(gp):
+    model, likelihood, x_train = gp
+    traced = trace_gp(model, likelihood, x_train)
+
+    with torch.no_grad(), gpytorch.settings.trace_mode():
+        y_pred, y_var = traced(x_train)
+    y_pred_eager, y_std_eager = predict_gp(model, likelihood, x_train, fast=True)
+
+    torch.testing.assert_close(y_pred, y_pred_eager)
+    torch.testing.assert_close(y_var.sqrt(), y_std_eager)
+
+
+def test_gp_with_one_training_point_is_not_traced():
+    likelihood = gpytorch.likelihoods.GaussianLikelihood()
+    x_train = torch.randn(1, 4)
+    model = GP(x_train, torch.ones(1), likelihood)
+
+    assert trace_gp(model, likelihood, x_train) is None
+
+
+def test_failing_traced_gp_is_dropped(gp):
+    model, likelihood, x_train = gp
+    calls = []
+
+    def traced(X):
+        calls.append(X)
+        raise RuntimeError('shape mismatch')
+
+    gp_model = Model(model_type='gp')
+    gp_model._model, gp_model.likelihood, gp_model._compiled_model = model, likelihood, traced
+    X = torch.randn(13, 4)
+
+    with pytest.warns(UserWarning, match='eager mode'):
+        y_pred, _ = gp_model._predict_gp(X)
+    y_pred_again, _ = gp_model._predict_gp(X)
+
+    assert gp_model._compiled_model is None
+    assert len(calls) == 1
+    torch.testing.assert_close(y_pred, predict_gp(model, likelihood, X)[0])
+    torch.testing.assert_close(y_pred_again, y_pred)
+
+
+def test_rbf_kernel_is_dense_unless_keops_is_requested():
+    assert type(rbf_kernel(10000)) is gpytorch.kernels.RBFKernel
+    assert type(rbf_kernel(10, keops_threshold=1000)) is gpytorch.kernels.RBFKernel